@@ -9,4 +9,16 @@ class Config:
     PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME", "scholar-bot")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+    # Per-worker admission control for /chat/query
+    CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))
+    CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "32"))
+    CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "10"))
+
+    # Ingestion batching and concurrency
+    EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "8000"))
+    EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+    UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", "4"))
+    UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "100"))
+    INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "5"))
+
 config = Config()
@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import hashlib
+import os
+import time
+from itertools import cycle, islice
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+# The real clients refuse to construct without keys; the fakes never use them
+os.environ.setdefault("OPENAI_API_KEY", "loadtest")
+os.environ.setdefault("PINECONE_API_KEY", "loadtest")
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.vectorstores import InMemoryVectorStore
+
+ANSWER_WORDS = (
+    "Based on the document, the sequence to sequence model uses an encoder "
+    "LSTM to map the input sentence to a fixed vector and a decoder LSTM to "
+    "generate the output sentence from that vector."
+).split()
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers with canned tokens at a configurable pace"""
+    first_token_latency: float = 0.3
+    token_latency: float = 0.02
+    answer_tokens: int = 40
+
+    @property
+    def _llm_type(self) -> str:
+        return "loadtest-fake"
+
+    def _tokens(self) -> List[str]:
+        return [f"{word} " for word in islice(cycle(ANSWER_WORDS), self.answer_tokens)]
+
+    def _total_latency(self) -> float:
+        return self.first_token_latency + self.token_latency * max(0, self.answer_tokens - 1)
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self._total_latency())
+        message = AIMessage(content="".join(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        await asyncio.sleep(self._total_latency())
+        message = AIMessage(content="".join(self._tokens()))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for index, token in enumerate(self._tokens()):
+            if index:
+                await asyncio.sleep(self.token_latency)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token))
+            if run_manager:
+                await run_manager.on_llm_new_token(token, chunk=chunk)
+            yield chunk
+
+class FakeModelFactory:
+    """Drop-in for ModelFactory that always returns a FakeChatModel"""
+
+    def __init__(self, **model_settings):
+        self.model_settings = model_settings
+
+    def get_chat_model(self, provider=None, model_config: Optional[Dict[str, Any]] = None, **kwargs) -> FakeChatModel:
+        model_config = model_config or {}
+        return FakeChatModel(callbacks=model_config.get("callbacks"), **self.model_settings)
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hash-based embeddings with a per-request delay"""
+
+    def __init__(self, latency: float = 0.05, dimension: int = 64):
+        self.latency = latency
+        self.dimension = dimension
+
+    def vector(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [digest[i % len(digest)] / 255.0 for i in range(self.dimension)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self.vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [self.vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self.vector(text)
+
+class FakeIndex:
+    """Pinecone index handle that upserts into an in-memory vector store"""
+
+    def __init__(self, store: InMemoryVectorStore, latency: float):
+        self.store = store
+        self.latency = latency
+
+    def upsert(self, vectors: List[Dict[str, Any]], **kwargs):
+        time.sleep(self.latency)
+        for record in vectors:
+            metadata = dict(record.get("metadata") or {})
+            text = metadata.pop("text", "")
+            self.store.store[record["id"]] = {
+                "id": record["id"],
+                "vector": record["values"],
+                "text": text,
+                "metadata": metadata,
+            }
+        return {"upserted_count": len(vectors)}
+
+class FakeIndexDescription:
+    status = {"ready": True}
+
+class FakePinecone:
+    """The subset of the Pinecone client used by services.embeddings"""
+
+    def __init__(self, store: InMemoryVectorStore, upsert_latency: float):
+        self.store = store
+        self.upsert_latency = upsert_latency
+        self.indexes = set()
+
+    def list_indexes(self) -> List[Dict[str, str]]:
+        return [{"name": name} for name in self.indexes]
+
+    def create_index(self, name: str, **kwargs):
+        self.indexes.add(name)
+
+    def delete_index(self, name: str):
+        self.indexes.discard(name)
+        self.store.store.clear()
+
+    def describe_index(self, name: str) -> FakeIndexDescription:
+        return FakeIndexDescription()
+
+    def Index(self, name: str) -> FakeIndex:
+        return FakeIndex(self.store, self.upsert_latency)
+
+def add_fake_arguments(parser: argparse.ArgumentParser):
+    """Add the fake-service latency options to a command line parser."""
+    group = parser.add_argument_group("fake services")
+    group.add_argument("--llm-first-token-ms", type=float, default=300.0,
+                       help="Delay before the fake LLM emits its first token")
+    group.add_argument("--llm-token-ms", type=float, default=20.0,
+                       help="Delay between fake LLM tokens")
+    group.add_argument("--answer-tokens", type=int, default=40,
+                       help="Number of tokens in each fake answer")
+    group.add_argument("--embed-ms", type=float, default=50.0,
+                       help="Latency of each fake embedding request")
+    group.add_argument("--upsert-ms", type=float, default=20.0,
+                       help="Latency of each fake vector upsert")
+
+def install_fakes(
+    args: argparse.Namespace,
+    patch: Callable[[Any, str, Any], None] = setattr
+) -> InMemoryVectorStore:
+    """
+    Point the app's services at local fakes and seed the knowledge base.
+
+    Args:
+        args (argparse.Namespace): Parsed fake-service options
+        patch (Callable): Sets an attribute on a module; pass a test
+            framework's monkeypatch.setattr to have the fakes undone afterwards
+
+    Returns:
+        InMemoryVectorStore: The store backing both retrieval and ingestion
+    """
+    import services.chat
+    import services.embeddings
+    from config import config
+    from utils.pdf_processor import process_pdf_document
+
+    embeddings = FakeEmbeddings(latency=args.embed_ms / 1000)
+    store = InMemoryVectorStore(embedding=embeddings)
+    client = FakePinecone(store, upsert_latency=args.upsert_ms / 1000)
+    client.create_index(config.PINECONE_INDEX_NAME)
+
+    def create_pinecone_index():
+        client.create_index(config.PINECONE_INDEX_NAME)
+        return store
+
+    patch(services.embeddings, "pc", client)
+    patch(services.embeddings, "get_embeddings_function", lambda **kwargs: embeddings)
+    patch(services.embeddings, "create_pinecone_index", create_pinecone_index)
+    patch(services.chat, "create_pinecone_index", create_pinecone_index)
+    patch(services.chat, "ModelFactory", lambda: FakeModelFactory(
+        first_token_latency=args.llm_first_token_ms / 1000,
+        token_latency=args.llm_token_ms / 1000,
+        answer_tokens=args.answer_tokens,
+    ))
+
+    # Seed directly so start-up does not pay the fake embedding latency
+    seed_path = os.path.join("static", "Seq2Seq.pdf")
+    chunks = process_pdf_document(seed_path) if os.path.exists(seed_path) else []
+    for index, chunk in enumerate(chunks):
+        store.store[f"seed-{index}"] = {
+            "id": f"seed-{index}",
+            "vector": embeddings.vector(chunk),
+            "text": chunk,
+            "metadata": {},
+        }
+    return store
@@ -0,0 +1,449 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import httpx
+import psutil
+import uvicorn
+from loadtest.fakes import add_fake_arguments
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENDPOINTS = ("query", "stream", "upload")
+
+DEFAULT_QUESTIONS = [
+    "What is the main contribution of the paper?",
+    "How does the encoder work?",
+    "What architecture does the decoder use?",
+    "Why does reversing the source sentence help?",
+    "What dataset was used for the experiments?",
+    "What BLEU score did the model reach?",
+    "How deep are the LSTMs?",
+    "How does beam search affect the results?",
+    "What are the limitations of the approach?",
+    "How does the model handle long sentences?",
+]
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse an endpoint mix such as 'query=0.6,stream=0.4'."""
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {name}")
+        mix[name] = float(weight)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("The mix needs at least one positive weight")
+    return mix
+
+def load_questions(path: Optional[str]) -> List[str]:
+    """Load one question per line, or fall back to the built-in corpus."""
+    if not path:
+        return DEFAULT_QUESTIONS
+    with open(path, encoding="utf-8") as f:
+        questions = [line.strip() for line in f if line.strip()]
+    if not questions:
+        raise ValueError(f"No questions found in {path}")
+    return questions
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Linearly interpolated percentile of values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def summarize(seconds: List[float]) -> Dict[str, Optional[float]]:
+    """Summarize durations in seconds as millisecond percentiles."""
+    def ms(value):
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        "p50": ms(percentile(seconds, 50)),
+        "p95": ms(percentile(seconds, 95)),
+        "p99": ms(percentile(seconds, 99)),
+        "mean": ms(sum(seconds) / len(seconds)) if seconds else None,
+        "max": ms(max(seconds)) if seconds else None,
+    }
+
+class EndpointStats:
+    """Latency and outcome counters for one endpoint"""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.first_token: List[float] = []
+        self.token_gaps: List[float] = []
+        self.stream_chunks: List[int] = []
+        self.outcomes: Counter = Counter()
+
+    def to_dict(self, duration: float, is_stream: bool = False) -> Dict[str, Any]:
+        data = {
+            "requests": sum(self.outcomes.values()),
+            "ok": len(self.latencies),
+            "outcomes": dict(self.outcomes),
+            "throughput_rps": round(len(self.latencies) / duration, 2) if duration else 0.0,
+            "latency_ms": summarize(self.latencies),
+        }
+        if is_stream:
+            data["ttft_ms"] = summarize(self.first_token)
+            data["inter_token_ms"] = summarize(self.token_gaps)
+            data["mean_chunks"] = (
+                round(sum(self.stream_chunks) / len(self.stream_chunks), 2) if self.stream_chunks else None
+            )
+        return data
+
+class RssSampler:
+    """Track the peak resident set size of a process by polling it"""
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def sample(self):
+        try:
+            self.peak = max(self.peak, self.process.memory_info().rss)
+        except psutil.Error:
+            pass
+
+    async def _run(self):
+        while True:
+            self.sample()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        self.sample()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+class InProcessServer:
+    """Serve the app from a uvicorn thread inside the load generator process"""
+
+    def __init__(self, args: argparse.Namespace):
+        from loadtest.server import build_app
+
+        self.pid = os.getpid()
+        self.base_url = f"http://127.0.0.1:{args.port}"
+        self.server = uvicorn.Server(
+            uvicorn.Config(build_app(args), host="127.0.0.1", port=args.port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("In-process server failed to start")
+            time.sleep(0.05)
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+class SubprocessServer:
+    """Serve the app from a separate uvicorn process"""
+
+    FAKE_OPTIONS = ("llm_first_token_ms", "llm_token_ms", "answer_tokens", "embed_ms", "upsert_ms")
+
+    def __init__(self, args: argparse.Namespace):
+        self.base_url = f"http://127.0.0.1:{args.port}"
+        self.command = [sys.executable, "-m", "loadtest.server", "--port", str(args.port)]
+        for option in self.FAKE_OPTIONS:
+            self.command += [f"--{option.replace('_', '-')}", str(getattr(args, option))]
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def start(self, timeout: float = 60.0):
+        self.process = subprocess.Popen(self.command, cwd=REPO_ROOT)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}")
+            try:
+                httpx.get(self.base_url + "/openapi.json", timeout=1.0)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("Server did not become ready in time")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+class LoadGenerator:
+    """Closed-loop load generator: each worker sends its next request as soon as the last one finishes"""
+
+    def __init__(self, client: httpx.AsyncClient, args: argparse.Namespace):
+        self.client = client
+        self.args = args
+        self.questions = load_questions(args.questions)
+        self.kinds = [kind for kind, weight in args.mix.items() if weight > 0]
+        self.weights = [args.mix[kind] for kind in self.kinds]
+        self.stats = {kind: EndpointStats() for kind in self.kinds}
+        self.sessions: List[str] = []
+        self.issued = 0
+        self.deadline = None
+        self.upload_content = b""
+        if "upload" in self.kinds:
+            with open(args.upload_file, "rb") as f:
+                self.upload_content = f.read()
+
+    def _claim(self) -> bool:
+        """Reserve the next request, or report that the run is over."""
+        if self.args.requests:
+            if self.issued >= self.args.requests:
+                return False
+        elif time.monotonic() >= self.deadline:
+            return False
+        self.issued += 1
+        return True
+
+    def _pick_session(self) -> Optional[str]:
+        if self.sessions and random.random() < self.args.session_reuse:
+            return random.choice(self.sessions)
+        return None
+
+    def _remember_session(self, session_id: Optional[str]):
+        if session_id and session_id not in self.sessions and len(self.sessions) < self.args.max_sessions:
+            self.sessions.append(session_id)
+
+    def _chat_payload(self, is_stream: bool) -> Dict[str, Any]:
+        return {
+            "message": random.choice(self.questions),
+            "session_id": self._pick_session(),
+            "is_stream": is_stream,
+        }
+
+    async def _query(self, stats: EndpointStats):
+        started = time.perf_counter()
+        response = await self.client.post("/chat/query", json=self._chat_payload(False))
+        elapsed = time.perf_counter() - started
+
+        stats.outcomes[response.status_code] += 1
+        if response.status_code == 200:
+            stats.latencies.append(elapsed)
+            self._remember_session(response.json().get("session_id"))
+
+    async def _stream(self, stats: EndpointStats):
+        started = time.perf_counter()
+        async with self.client.stream("POST", "/chat/query", json=self._chat_payload(True)) as response:
+            if response.status_code != 200:
+                await response.aread()
+                stats.outcomes[response.status_code] += 1
+                return
+
+            last = None
+            chunks = 0
+            async for chunk in response.aiter_raw():
+                if not chunk:
+                    continue
+                now = time.perf_counter()
+                if last is None:
+                    stats.first_token.append(now - started)
+                else:
+                    stats.token_gaps.append(now - last)
+                last = now
+                chunks += 1
+
+        stats.outcomes[response.status_code] += 1
+        stats.latencies.append(time.perf_counter() - started)
+        stats.stream_chunks.append(chunks)
+        self._remember_session(response.headers.get("X-Session-ID"))
+
+    async def _upload(self, stats: EndpointStats):
+        filename = os.path.basename(self.args.upload_file)
+        started = time.perf_counter()
+        response = await self.client.post(
+            "/embeddings/upload-file",
+            files={"file": (filename, self.upload_content, "application/octet-stream")},
+        )
+        elapsed = time.perf_counter() - started
+
+        stats.outcomes[response.status_code] += 1
+        if response.status_code == 200:
+            stats.latencies.append(elapsed)
+
+    async def _worker(self):
+        while self._claim():
+            kind = random.choices(self.kinds, self.weights)[0]
+            try:
+                await getattr(self, f"_{kind}")(self.stats[kind])
+            except httpx.HTTPError as e:
+                self.stats[kind].outcomes[type(e).__name__] += 1
+
+    async def run(self) -> float:
+        """Run all workers and return the elapsed wall time in seconds."""
+        self.deadline = time.monotonic() + self.args.duration
+        started = time.perf_counter()
+        await asyncio.gather(*[self._worker() for _ in range(self.args.concurrency)])
+        return time.perf_counter() - started
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_load(args: argparse.Namespace, base_url: str, server_pid: Optional[int]) -> Dict[str, Any]:
+    """Drive the server and collect the results document."""
+    sampler = RssSampler(server_pid) if server_pid else None
+    if sampler:
+        sampler.start()
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        generator = LoadGenerator(client, args)
+        duration = await generator.run()
+
+    if sampler:
+        await sampler.stop()
+
+    endpoints = {
+        kind: stats.to_dict(duration, is_stream=kind == "stream")
+        for kind, stats in generator.stats.items()
+    }
+    peak_rss_mb = round(sampler.peak / (1024 * 1024), 1) if sampler else None
+    # In-process runs share the process with the load generator, so their peak
+    # is kept apart from server_peak_rss_mb to keep release comparisons honest
+    in_process = args.mode == "inprocess"
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": git_commit(),
+        "mode": args.mode,
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "duration_seconds": round(duration, 3),
+        "requests": sum(data["requests"] for data in endpoints.values()),
+        "throughput_rps": round(sum(data["ok"] for data in endpoints.values()) / duration, 2),
+        "server_peak_rss_mb": None if in_process else peak_rss_mb,
+        "process_peak_rss_mb": peak_rss_mb if in_process else None,
+        "endpoints": endpoints,
+    }
+
+def compare_results(current: Dict[str, Any], previous: Dict[str, Any]):
+    """Print headline metrics next to a previous run."""
+    def change(new, old):
+        if new is None or old in (None, 0):
+            return ""
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    if current.get("mode") != previous.get("mode"):
+        print(f"\nWarning: comparing a {current.get('mode')} run against a {previous.get('mode')} run")
+
+    rows = [("overall", "throughput_rps", current.get("throughput_rps"), previous.get("throughput_rps")),
+            ("server", "peak_rss_mb", current.get("server_peak_rss_mb"), previous.get("server_peak_rss_mb")),
+            ("process", "peak_rss_mb", current.get("process_peak_rss_mb"), previous.get("process_peak_rss_mb"))]
+    for kind, data in current["endpoints"].items():
+        old = previous.get("endpoints", {}).get(kind, {})
+        rows.append((kind, "throughput_rps", data["throughput_rps"], old.get("throughput_rps")))
+        for group in ("latency_ms", "ttft_ms", "inter_token_ms"):
+            if group not in data:
+                continue
+            for pct in ("p50", "p95", "p99"):
+                rows.append((kind, f"{group}.{pct}", data[group][pct], old.get(group, {}).get(pct)))
+
+    print(f"\n{'endpoint':<10}{'metric':<22}{'previous':>12}{'current':>12}{'change':>10}")
+    for kind, metric, new, old in rows:
+        print(f"{kind:<10}{metric:<22}{str(old):>12}{str(new):>12}{change(new, old):>10}")
+
+def print_summary(results: Dict[str, Any]):
+    if results["mode"] == "inprocess":
+        memory = f"load generator + server peak RSS {results['process_peak_rss_mb']} MB"
+    else:
+        memory = f"server peak RSS {results['server_peak_rss_mb']} MB"
+    print(f"\n{results['requests']} requests in {results['duration_seconds']}s "
+          f"({results['throughput_rps']} ok/s), {memory} [{results['mode']} mode]")
+    for kind, data in results["endpoints"].items():
+        latency = data["latency_ms"]
+        line = (f"  {kind:<7} ok={data['ok']}/{data['requests']} "
+                f"p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} ms")
+        if "ttft_ms" in data:
+            line += f" ttft.p95={data['ttft_ms']['p95']} gap.p95={data['inter_token_ms']['p95']} ms"
+        print(line)
+        if set(data["outcomes"]) - {200}:
+            print(f"          outcomes: {data['outcomes']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the ScholarBot API")
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn", "external"), default="uvicorn",
+                        help="Serve the app in a uvicorn subprocess, in this process, or target --url")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="Base URL for --mode external")
+    parser.add_argument("--server-pid", type=int, help="Process to sample RSS from in --mode external")
+    parser.add_argument("--port", type=int, default=8765, help="Port for the in-process or subprocess server")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("query=0.5,stream=0.5"),
+                        help="Weighted endpoint mix, e.g. query=0.6,stream=0.35,upload=0.05")
+    parser.add_argument("--concurrency", type=int, default=16, help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=0, help="Total requests to send (overrides --duration)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds to run when --requests is not set")
+    parser.add_argument("--session-reuse", type=float, default=0.5,
+                        help="Probability that a chat request continues an existing session")
+    parser.add_argument("--max-sessions", type=int, default=100, help="Size of the reusable session pool")
+    parser.add_argument("--questions", help="File with one question per line")
+    parser.add_argument("--upload-file", default=os.path.join(REPO_ROOT, "static", "Seq2Seq.pdf"),
+                        help="Document sent to /embeddings/upload-file")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, help="Random seed for a repeatable request sequence")
+    parser.add_argument("--output", default="loadtest-results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Previous results JSON to compare against")
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    server = None
+    if args.mode == "inprocess":
+        server = InProcessServer(args)
+    elif args.mode == "uvicorn":
+        server = SubprocessServer(args)
+
+    if server:
+        server.start()
+    try:
+        base_url = server.base_url if server else args.url
+        server_pid = server.pid if server else args.server_pid
+        results = asyncio.run(run_load(args, base_url, server_pid))
+    finally:
+        if server:
+            server.stop()
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print_summary(results)
+    print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare_results(results, json.load(f))
+
+if __name__ == "__main__":
+    main()
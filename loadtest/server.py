@@ -0,0 +1,21 @@
+import argparse
+import uvicorn
+from loadtest.fakes import add_fake_arguments, install_fakes
+
+def build_app(args: argparse.Namespace):
+    """Install the fake services and return the ScholarBot app."""
+    install_fakes(args)
+    from main import app
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Run ScholarBot under uvicorn with local fake services")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    add_fake_arguments(parser)
+    args = parser.parse_args()
+
+    uvicorn.run(build_app(args), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
-from typing import Dict
+from typing import Dict, Any, List, Tuple
 from uuid import uuid4
 from langchain_community.chat_message_histories import ChatMessageHistory
+from langchain_core.messages import BaseMessage
+from config import config
 from services.chat import query_bot
+from services.concurrency import (
+    AdmissionController,
+    AdmissionRejected,
+    SingleFlight,
+    StreamBroadcast,
+    make_query_key,
+)
+from services.embeddings import get_corpus_version
 from models.chat import ChatRequest, ChatResponse, MessageResponse, Document
 
 router = APIRouter()
@@ -11,6 +21,62 @@ router = APIRouter()
 # Store chat histories in memory (consider using Redis or a database for production)
 sessions: Dict[str, ChatMessageHistory] = {}
 
+# Identical concurrent queries share one upstream run, and upstream runs are
+# capped per worker so bursts queue briefly or get a fast 429
+flights = SingleFlight()
+admission = AdmissionController(
+    max_concurrency=config.CHAT_MAX_CONCURRENCY,
+    max_queue=config.CHAT_MAX_QUEUE,
+    queue_timeout=config.CHAT_QUEUE_TIMEOUT,
+)
+
+def _snapshot_history(chat_history: ChatMessageHistory) -> ChatMessageHistory:
+    """Copy a history so a shared run does not write into one caller's session."""
+    return ChatMessageHistory(messages=list(chat_history.messages))
+
+async def _run_query(user_query: str, chat_history: ChatMessageHistory, session_id: str) -> Tuple[Dict[str, Any], List[BaseMessage]]:
+    """Run a non-streaming query and return the response with the messages it added."""
+    snapshot = _snapshot_history(chat_history)
+    base_length = len(snapshot.messages)
+    response = await admission.run(
+        lambda: query_bot(
+            user_query=user_query,
+            chat_history=snapshot,
+            session_id=session_id
+        )
+    )
+    return response, snapshot.messages[base_length:]
+
+async def _start_stream(user_query: str, chat_history: ChatMessageHistory, key: tuple, session_id: str) -> Tuple[StreamBroadcast, ChatMessageHistory, int]:
+    """Start a streaming query in the background and return its broadcast."""
+    started = await admission.acquire()
+    try:
+        snapshot = _snapshot_history(chat_history)
+        base_length = len(snapshot.messages)
+        stream = await query_bot(
+            user_query=user_query,
+            chat_history=snapshot,
+            is_stream=True,
+            session_id=session_id
+        )
+    except BaseException:
+        admission.release(started)
+        raise
+
+    def on_complete():
+        admission.release(started)
+        flights.forget(key)
+
+    broadcast = StreamBroadcast()
+    broadcast.start(stream, on_complete=on_complete)
+    return broadcast, snapshot, base_length
+
+async def _relay_stream(broadcast: StreamBroadcast, snapshot: ChatMessageHistory, base_length: int, chat_history: ChatMessageHistory):
+    """Stream a shared broadcast to one client, then record the turn in its session."""
+    async for chunk in broadcast.subscribe():
+        yield chunk
+    chat_history.add_messages(snapshot.messages[base_length:])
+
 @router.post("/query", response_model=ChatResponse)
 async def query_chatbot(chat_request: ChatRequest):
     """
@@ -28,15 +94,21 @@ async def query_chatbot(chat_request: ChatRequest):
             sessions[session_id] = ChatMessageHistory()
         
         chat_history = sessions[session_id]
+        key = make_query_key(
+            chat_request.message,
+            chat_history.messages,
+            get_corpus_version(),
+            chat_request.is_stream
+        )
 
         if chat_request.is_stream:
+            broadcast, snapshot, base_length = await flights.do(
+                key,
+                lambda: _start_stream(chat_request.message, chat_history, key, session_id),
+                forget=False
+            )
             response = StreamingResponse(
-                await query_bot(
-                    user_query=chat_request.message,
-                    chat_history=chat_history,
-                    is_stream=True,
-                    session_id=session_id
-                ),
+                _relay_stream(broadcast, snapshot, base_length, chat_history),
                 media_type='text/event-stream'
             )
             
@@ -44,12 +116,12 @@ async def query_chatbot(chat_request: ChatRequest):
             
             return response
 
-        # Query the bot with chat history
-        response = await query_bot(
-            user_query=chat_request.message,
-            chat_history=chat_history,
-            session_id=session_id
+        # Query the bot with chat history, sharing the run with identical requests
+        response, new_messages = await flights.do(
+            key,
+            lambda: _run_query(chat_request.message, chat_history, session_id)
         )
+        chat_history.add_messages(new_messages)
         
         return ChatResponse(
             session_id=session_id,
@@ -58,6 +130,12 @@ async def query_chatbot(chat_request: ChatRequest):
             source_documents=[Document(**doc) for doc in response["source_documents"]]
         )
         
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -27,7 +27,7 @@ async def upload_pdf(file: UploadFile):
                 detail="No text could be extracted from the file"
             )
         
-        result = store_embeddings(doc_chunks)
+        result = await store_embeddings(doc_chunks)
         
         if result["status"] == "error":
             raise HTTPException(
@@ -54,7 +54,7 @@ async def init_knowledge_base():
             detail="PDF file not found in static folder"
         )
     
-    result = initialize_knowledge_base(pdf_path)
+    result = await initialize_knowledge_base(pdf_path)
     
     if result["status"] == "error":
         raise HTTPException(
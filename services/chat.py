@@ -134,17 +134,11 @@ async def query_bot(
                         }
                     )
                     
-                    complete_response = []
+                    # RunnableWithMessageHistory records the turn once the stream ends
                     async for chunk in stream:
                         if 'answer' in chunk:
-                            complete_response.append(chunk['answer'])
                             yield chunk['answer']
                             await asyncio.sleep(0.05)
-                    
-                    if complete_response and chat_history is not None:
-                        full_response = "".join(complete_response)
-                        chat_history.add_user_message(user_query)
-                        chat_history.add_ai_message(full_response)
 
                 except Exception as e:
                     print(f"Error in streaming response: {str(e)}")
@@ -164,11 +158,8 @@ async def query_bot(
                 }
             )
 
+            # RunnableWithMessageHistory has already recorded the turn
             answer = str(response.get("answer", ""))
-            
-            if chat_history is not None:
-                chat_history.add_user_message(user_query)
-                chat_history.add_ai_message(answer)
 
             return {
                 "answer": answer,
@@ -0,0 +1,212 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Sequence
+
+def normalize_query(query: str) -> str:
+    """Collapse whitespace and case so trivially different queries share a key."""
+    return " ".join(query.split()).casefold()
+
+def hash_history(messages: Sequence[Any]) -> str:
+    """Hash a chat history by message type and content."""
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(message.type.encode("utf-8"))
+        digest.update(b"\x00")
+        digest.update(str(message.content).encode("utf-8"))
+        digest.update(b"\x01")
+    return digest.hexdigest()
+
+def make_query_key(query: str, messages: Sequence[Any], corpus_version: int, is_stream: bool) -> tuple:
+    """Build the single-flight key for a chat query."""
+    return (is_stream, normalize_query(query), hash_history(messages), corpus_version)
+
+class AdmissionRejected(Exception):
+    """Raised when the admission controller cannot accept more work"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Server is busy, please retry after {retry_after} seconds")
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Per-worker concurrency limit with a bounded wait queue"""
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        # Counters change synchronously, before any await, so a burst that
+        # arrives in one loop iteration still sees the slots it has taken
+        self._in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self._avg_service_time = 1.0
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """Estimate how long a rejected client should wait before retrying."""
+        backlog = (self.waiting + 1) / self.max_concurrency
+        return max(1, math.ceil(self._avg_service_time * backlog))
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free slot and return the time it was granted.
+
+        Raises:
+            AdmissionRejected: If the wait queue is full or the wait times out
+        """
+        if self._in_flight < self.max_concurrency and not self._waiters:
+            self._in_flight += 1
+            return time.monotonic()
+
+        if self.waiting >= self.max_queue:
+            raise AdmissionRejected(self.retry_after())
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            # asyncio.wait never cancels the waiter, so a slot handed over
+            # right at the timeout is still seen below instead of being lost
+            await asyncio.wait([waiter], timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            if waiter.done():
+                self._release_slot()
+            else:
+                self._drop_waiter(waiter)
+            raise
+
+        if not waiter.done():
+            self._drop_waiter(waiter)
+            raise AdmissionRejected(self.retry_after())
+        return time.monotonic()
+
+    def release(self, started: float):
+        """Free a slot and fold its service time into the running average."""
+        elapsed = time.monotonic() - started
+        self._avg_service_time = 0.8 * self._avg_service_time + 0.2 * elapsed
+        self._release_slot()
+
+    def _release_slot(self):
+        """Hand the slot to the longest waiting caller, or return it to the pool."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self._in_flight -= 1
+
+    def _drop_waiter(self, waiter: asyncio.Future):
+        waiter.cancel()
+        self._waiters.remove(waiter)
+
+    async def run(self, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run a coroutine function inside an admission slot."""
+        started = await self.acquire()
+        try:
+            return await fn()
+        finally:
+            self.release(started)
+
+class SingleFlight:
+    """Merge concurrent calls with the same key into one upstream execution"""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        forget: bool = True
+    ) -> Any:
+        """
+        Run fn once for all concurrent callers sharing key.
+
+        Args:
+            key (Hashable): Identity of the call
+            fn (Callable): Coroutine function doing the upstream work
+            forget (bool): Drop the key once fn finishes. Pass False when the
+                result keeps producing data and call forget() when it is done.
+
+        Returns:
+            Any: The shared result of fn
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+
+            def on_done(done: asyncio.Task):
+                if forget or done.cancelled() or done.exception() is not None:
+                    self.forget(key, done)
+
+            task.add_done_callback(on_done)
+
+        # Shield so one disconnecting client does not cancel the others' work
+        return await asyncio.shield(task)
+
+    def forget(self, key: Hashable, task: Optional[asyncio.Task] = None):
+        """Stop coalescing new callers onto key."""
+        if task is None or self._calls.get(key) is task:
+            self._calls.pop(key, None)
+
+class StreamBroadcast:
+    """Replay one upstream token stream to any number of subscribers"""
+
+    def __init__(self):
+        self._chunks: List[str] = []
+        self._done = False
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def start(
+        self,
+        source: AsyncIterator[str],
+        on_complete: Optional[Callable[[], None]] = None
+    ):
+        """Start pumping source in the background, independent of any subscriber."""
+        self._task = asyncio.ensure_future(self._pump(source, on_complete))
+
+    async def _pump(self, source: AsyncIterator[str], on_complete: Optional[Callable[[], None]]):
+        try:
+            async for chunk in source:
+                self._chunks.append(chunk)
+                self._notify()
+        except Exception as e:
+            print(f"Error in stream broadcast: {str(e)}")
+        finally:
+            self._done = True
+            self._notify()
+            if on_complete:
+                on_complete()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        """Yield every chunk from the start of the stream, then follow it live."""
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self._chunks):
+                yield self._chunks[index]
+                index += 1
+            if self._done:
+                return
+            await changed.wait()
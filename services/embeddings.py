@@ -1,15 +1,75 @@
+import asyncio
 import time
-from typing import List
+from typing import Any, Callable, Dict, List
 from langchain_openai import OpenAIEmbeddings
 from langchain_pinecone import PineconeVectorStore
 from config import config
 from pinecone import Pinecone, ServerlessSpec
+from services.ingestion import IngestionWriter, get_token_counter
 from utils.pdf_processor import process_pdf_document
 
 pc = Pinecone(api_key=config.PINECONE_API_KEY)
 
-def get_embeddings_function() -> OpenAIEmbeddings:
-    return OpenAIEmbeddings(openai_api_key=config.OPENAI_API_KEY)
+# Bumped whenever the knowledge base changes so cached or coalesced answers
+# from an older corpus are never shared with newer queries
+_corpus_version = 0
+
+def get_corpus_version() -> int:
+    return _corpus_version
+
+def _bump_corpus_version():
+    global _corpus_version
+    _corpus_version += 1
+
+def get_embeddings_function(**kwargs) -> OpenAIEmbeddings:
+    return OpenAIEmbeddings(openai_api_key=config.OPENAI_API_KEY, **kwargs)
+
+def get_ingestion_writer(count_tokens: Callable[[str], int]) -> IngestionWriter:
+    """Create an ingestion writer backed by OpenAI embeddings and the Pinecone index."""
+    # The writer owns retries and backoff, so the client should not retry on its own
+    embedding_function = get_embeddings_function(max_retries=0)
+    index = pc.Index(config.PINECONE_INDEX_NAME)
+
+    async def upsert_vectors(vectors: List[Dict[str, Any]]):
+        await asyncio.to_thread(index.upsert, vectors=vectors)
+
+    return IngestionWriter(
+        embed_documents=embedding_function.aembed_documents,
+        upsert_vectors=upsert_vectors,
+        batch_tokens=config.EMBED_BATCH_TOKENS,
+        embed_concurrency=config.EMBED_CONCURRENCY,
+        upsert_concurrency=config.UPSERT_CONCURRENCY,
+        upsert_batch_size=config.UPSERT_BATCH_SIZE,
+        max_retries=config.INGEST_MAX_RETRIES,
+        count_tokens=count_tokens,
+        text_key="text"
+    )
+
+async def write_chunks(chunks: List[str]) -> dict:
+    """Embed and store chunks, reporting partial failures instead of aborting."""
+    # The tokenizer may be downloaded on first use, so keep it off the event loop
+    count_tokens = await asyncio.to_thread(get_token_counter)
+    try:
+        stats = await get_ingestion_writer(count_tokens).write(chunks)
+    finally:
+        # Bump even on failure: batches may have landed before the error, and
+        # runs started during the write must not be shared afterwards
+        _bump_corpus_version()
+
+    if stats["chunk_count"] == 0:
+        status = "error"
+        message = f"Failed to store any of {len(chunks)} chunks of text"
+    elif stats["failed_chunk_count"]:
+        status = "partial"
+        message = (
+            f"Stored {stats['chunk_count']} of {len(chunks)} chunks of text; "
+            f"{stats['failed_batch_count']} batches failed"
+        )
+    else:
+        status = "success"
+        message = f"Successfully processed and stored {len(chunks)} chunks of text"
+
+    return {"status": status, "message": message, **stats}
 
 def delete_pinecone_index():
     """Delete the Pinecone index if it exists."""
@@ -54,31 +114,26 @@ def create_pinecone_index():
         print(f"Error creating index: {str(e)}")
         return None
 
-def store_embeddings(doc_chunks: List[str]) -> dict:
+async def store_embeddings(doc_chunks: List[str]) -> dict:
     """
     Store document chunks in Pinecone index.
     Deletes existing index if it exists and creates new embeddings.
     """
     try:
-        delete_pinecone_index()
+        try:
+            await asyncio.to_thread(delete_pinecone_index)
+        finally:
+            # The old corpus may be gone now, whatever happens next
+            _bump_corpus_version()
         
-        if not create_pinecone_index():
+        if not await asyncio.to_thread(create_pinecone_index):
             raise Exception("Failed to create index")
 
         # Create embeddings and store in Pinecone
-        embedding_function = get_embeddings_function()
-        PineconeVectorStore.from_texts(
-            texts=doc_chunks,
-            embedding=embedding_function,
-            index_name=config.PINECONE_INDEX_NAME,
-            text_key="text"
-        )
-        
-        return {
-            "status": "success",
-            "message": f"Successfully processed and stored {len(doc_chunks)} chunks of text",
-            "chunk_count": len(doc_chunks)
-        }
+        result = await write_chunks(doc_chunks)
+        if result["status"] == "error":
+            result["message"] = f"Error storing embeddings: {result['message']}"
+        return result
         
     except Exception as e:
         return {
@@ -87,28 +142,19 @@ def store_embeddings(doc_chunks: List[str]) -> dict:
             "chunk_count": 0
         }
 
-def initialize_knowledge_base(pdf_path: str):
+async def initialize_knowledge_base(pdf_path: str):
     """Initialize the knowledge base from a PDF document."""
     try:
         # Process the PDF document
-        chunks = process_pdf_document(pdf_path)
+        chunks = await asyncio.to_thread(process_pdf_document, pdf_path)
         if not chunks:
             raise Exception("No text chunks extracted from PDF")
 
         # Create embeddings and store in Pinecone
-        embedding_function = get_embeddings_function()
-        PineconeVectorStore.from_texts(
-            texts=chunks,
-            embedding=embedding_function,
-            index_name=config.PINECONE_INDEX_NAME,
-            text_key="text"
-        )
-        
-        return {
-            "status": "success",
-            "message": f"Successfully processed and stored {len(chunks)} chunks of text",
-            "chunk_count": len(chunks)
-        }
+        result = await write_chunks(chunks)
+        if result["status"] == "error":
+            result["message"] = f"Error initializing knowledge base: {result['message']}"
+        return result
         
     except Exception as e:
         return {
@@ -0,0 +1,217 @@
+import asyncio
+import functools
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+import tiktoken
+
+EmbedFunction = Callable[[List[str]], Awaitable[List[List[float]]]]
+UpsertFunction = Callable[[List[Dict[str, Any]]], Awaitable[Any]]
+
+@functools.lru_cache(maxsize=None)
+def _load_encoding(encoding_name: str) -> "tiktoken.Encoding":
+    # lru_cache does not store exceptions, so a failed download is retried next time
+    return tiktoken.get_encoding(encoding_name)
+
+def get_token_counter(encoding_name: str = "cl100k_base") -> Callable[[str], int]:
+    """
+    Return a function counting tokens the way the embedding model does.
+
+    Loading the encoding may download it over the network, so call this off
+    the event loop. A loaded encoding is cached per process; if loading fails,
+    a rough estimate is returned and the next call tries again.
+    """
+    try:
+        encoding = _load_encoding(encoding_name)
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        print(f"Error loading tokenizer, estimating token counts: {str(e)}")
+        return lambda text: max(1, len(text) // 4)
+
+def batch_by_tokens(
+    texts: List[str],
+    max_tokens: int,
+    count_tokens: Callable[[str], int]
+) -> List[Tuple[int, int]]:
+    """
+    Split texts into consecutive batches whose token totals stay under max_tokens.
+
+    Returns:
+        List[Tuple[int, int]]: (start, end) index ranges into texts
+    """
+    batches = []
+    start = 0
+    batch_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if index > start and batch_tokens + tokens > max_tokens:
+            batches.append((start, index))
+            start = index
+            batch_tokens = 0
+        batch_tokens += tokens
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Check whether an embedding or vector store error is a rate limit."""
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status == 429 or "RateLimit" in type(error).__name__
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Check whether an error may succeed on a later attempt.
+
+    Rate limits, server errors, connection errors and timeouts are retried;
+    anything else (bad credentials, invalid input, dimension mismatches) is not.
+    """
+    if is_rate_limit_error(error):
+        return True
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    if isinstance(status, int):
+        return status == 408 or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    # Client libraries wrap transport failures in their own types, e.g.
+    # openai.APIConnectionError or httpx.ConnectTimeout
+    return any(
+        "Connection" in cls.__name__ or "Timeout" in cls.__name__
+        for cls in type(error).__mro__
+    )
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Read a Retry-After hint from an error's HTTP response, if it has one."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+class IngestionWriter:
+    """Embed and upsert document chunks in concurrent, overlapping batches"""
+
+    def __init__(
+        self,
+        embed_documents: EmbedFunction,
+        upsert_vectors: UpsertFunction,
+        batch_tokens: int = 8000,
+        embed_concurrency: int = 4,
+        upsert_concurrency: int = 4,
+        upsert_batch_size: int = 100,
+        max_retries: int = 5,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        text_key: str = "text"
+    ):
+        self.embed_documents = embed_documents
+        self.upsert_vectors = upsert_vectors
+        self.batch_tokens = batch_tokens
+        self.embed_concurrency = embed_concurrency
+        self.upsert_concurrency = upsert_concurrency
+        self.upsert_batch_size = upsert_batch_size
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.count_tokens = count_tokens or get_token_counter()
+        self.text_key = text_key
+        # Shared pause so one rate-limited request slows down every worker
+        self._resume_at = 0.0
+
+    async def write(self, texts: List[str]) -> Dict[str, Any]:
+        """
+        Embed and store texts, retrying failed batches independently.
+
+        Args:
+            texts (List[str]): Document chunks to store
+
+        Returns:
+            Dict[str, Any]: Written and failed chunk counts and throughput
+        """
+        started = time.monotonic()
+        embed_slots = asyncio.Semaphore(self.embed_concurrency)
+        upsert_slots = asyncio.Semaphore(self.upsert_concurrency)
+
+        batches = batch_by_tokens(texts, self.batch_tokens, self.count_tokens)
+        written = await asyncio.gather(*[
+            self._write_batch(texts[start:end], embed_slots, upsert_slots)
+            for start, end in batches
+        ])
+
+        chunk_count = sum(written)
+        elapsed = time.monotonic() - started
+        return {
+            "chunk_count": chunk_count,
+            "failed_chunk_count": len(texts) - chunk_count,
+            "batch_count": len(batches),
+            "failed_batch_count": sum(
+                1 for (start, end), count in zip(batches, written) if count < end - start
+            ),
+            "seconds": round(elapsed, 3),
+            "chunks_per_second": round(chunk_count / elapsed, 2) if elapsed > 0 else 0.0,
+        }
+
+    async def _write_batch(
+        self,
+        texts: List[str],
+        embed_slots: asyncio.Semaphore,
+        upsert_slots: asyncio.Semaphore
+    ) -> int:
+        """Embed one batch, then upsert it while later batches are being embedded."""
+        try:
+            vectors = await self._with_retries(lambda: self.embed_documents(texts), embed_slots)
+        except Exception as e:
+            print(f"Error embedding batch of {len(texts)} chunks: {str(e)}")
+            return 0
+
+        records = [
+            {"id": str(uuid4()), "values": vector, "metadata": {self.text_key: text}}
+            for text, vector in zip(texts, vectors)
+        ]
+        parts = [
+            records[i:i + self.upsert_batch_size]
+            for i in range(0, len(records), self.upsert_batch_size)
+        ]
+        results = await asyncio.gather(
+            *[self._upsert(part, upsert_slots) for part in parts],
+            return_exceptions=True
+        )
+
+        written = 0
+        for part, result in zip(parts, results):
+            if isinstance(result, Exception):
+                print(f"Error upserting batch of {len(part)} vectors: {str(result)}")
+            else:
+                written += len(part)
+        return written
+
+    async def _upsert(self, records: List[Dict[str, Any]], upsert_slots: asyncio.Semaphore):
+        await self._with_retries(lambda: self.upsert_vectors(records), upsert_slots)
+
+    async def _with_retries(self, fn: Callable[[], Awaitable[Any]], slots: asyncio.Semaphore) -> Any:
+        """
+        Call fn inside a slot, backing off exponentially and honouring rate-limit hints.
+
+        Only retryable errors are retried. The slot is held for each attempt but
+        not during backoff, so a failing batch does not hold up the others.
+        """
+        attempt = 0
+        while True:
+            pause = self._resume_at - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            try:
+                async with slots:
+                    return await fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable_error(e):
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                delay += random.uniform(0, delay / 2)
+                if is_rate_limit_error(e):
+                    delay = max(delay, _retry_after(e) or 0)
+                    self._resume_at = max(self._resume_at, time.monotonic() + delay)
+                attempt += 1
+                await asyncio.sleep(delay)
@@ -0,0 +1,179 @@
+import argparse
+import asyncio
+import pytest
+from services.concurrency import AdmissionController, AdmissionRejected, SingleFlight, StreamBroadcast
+
+async def _burst(controller: AdmissionController, size: int, hold: float = 0.05):
+    async def work():
+        await asyncio.sleep(hold)
+        return "ok"
+
+    return await asyncio.gather(
+        *[controller.run(work) for _ in range(size)],
+        return_exceptions=True
+    )
+
+def test_burst_without_queue_admits_only_concurrency_limit():
+    controller = AdmissionController(max_concurrency=1, max_queue=0, queue_timeout=5)
+    results = asyncio.run(_burst(controller, 10))
+
+    assert results.count("ok") == 1
+    assert sum(isinstance(r, AdmissionRejected) for r in results) == 9
+    assert all(r.retry_after >= 1 for r in results if isinstance(r, AdmissionRejected))
+    assert controller.in_flight == 0
+
+def test_burst_fills_bounded_queue_then_rejects():
+    controller = AdmissionController(max_concurrency=2, max_queue=3, queue_timeout=5)
+    results = asyncio.run(_burst(controller, 10))
+
+    assert results.count("ok") == 5
+    assert sum(isinstance(r, AdmissionRejected) for r in results) == 5
+    assert controller.in_flight == 0
+    assert controller.waiting == 0
+
+def test_queue_timeout_rejects_and_frees_queue():
+    controller = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=0.05)
+    results = asyncio.run(_burst(controller, 3, hold=0.2))
+
+    assert results.count("ok") == 1
+    assert sum(isinstance(r, AdmissionRejected) for r in results) == 2
+    assert controller.in_flight == 0
+    assert controller.waiting == 0
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=5, queue_timeout=5)
+        started = await controller.acquire()
+        waiter = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        controller.release(started)
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.in_flight == 0
+    assert controller.waiting == 0
+
+def test_single_flight_runs_once_for_concurrent_callers():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def scenario():
+        flights = SingleFlight()
+        results = await asyncio.gather(*[flights.do("key", work) for _ in range(10)])
+        return flights, results
+
+    flights, results = asyncio.run(scenario())
+    assert results == [42] * 10
+    assert calls == 1
+    assert "key" not in flights
+
+def test_stream_broadcast_replays_to_late_subscribers():
+    async def source():
+        for token in "abcde":
+            yield token
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        broadcast = StreamBroadcast()
+        broadcast.start(source())
+
+        async def subscribe(delay):
+            await asyncio.sleep(delay)
+            return "".join([chunk async for chunk in broadcast.subscribe()])
+
+        return await asyncio.gather(subscribe(0), subscribe(0.025), subscribe(0.2))
+
+    assert asyncio.run(scenario()) == ["abcde"] * 3
+
+@pytest.fixture
+def chat_app(monkeypatch):
+    """The app wired to local fakes, with chat state reset and restored afterwards."""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from loadtest.fakes import add_fake_arguments, install_fakes
+
+    parser = argparse.ArgumentParser()
+    add_fake_arguments(parser)
+    install_fakes(
+        parser.parse_args(["--llm-first-token-ms", "200", "--llm-token-ms", "0", "--embed-ms", "0"]),
+        patch=monkeypatch.setattr
+    )
+
+    import routers.chat
+    from main import app
+
+    monkeypatch.setattr(routers.chat, "sessions", {})
+    monkeypatch.setattr(routers.chat, "flights", SingleFlight())
+    return app
+
+async def _post_all(app, payloads):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*[client.post("/chat/query", json=payload) for payload in payloads])
+
+def test_chat_query_burst_returns_429(chat_app, monkeypatch):
+    import routers.chat
+
+    monkeypatch.setattr(
+        routers.chat,
+        "admission",
+        AdmissionController(max_concurrency=1, max_queue=0, queue_timeout=5)
+    )
+
+    # Distinct questions so request coalescing does not merge the burst
+    responses = asyncio.run(_post_all(chat_app, [{"message": f"Question {i}?"} for i in range(10)]))
+    statuses = [response.status_code for response in responses]
+
+    assert statuses.count(200) == 1
+    assert statuses.count(429) == 9
+    assert all(
+        int(response.headers["Retry-After"]) >= 1
+        for response in responses if response.status_code == 429
+    )
+
+@pytest.mark.parametrize("is_stream", [False, True])
+def test_identical_queries_share_one_run(chat_app, monkeypatch, is_stream):
+    import routers.chat
+
+    calls = []
+    query_bot = routers.chat.query_bot
+
+    async def counting_query_bot(**kwargs):
+        calls.append(kwargs["user_query"])
+        return await query_bot(**kwargs)
+
+    monkeypatch.setattr(routers.chat, "query_bot", counting_query_bot)
+
+    session_ids = [f"session-{i}" for i in range(6)]
+    responses = asyncio.run(_post_all(chat_app, [
+        {"message": "  What does the ENCODER do? ", "session_id": session_id, "is_stream": is_stream}
+        for session_id in session_ids
+    ] + [
+        {"message": "what does the encoder do?", "session_id": "late", "is_stream": is_stream}
+    ]))
+
+    assert [response.status_code for response in responses] == [200] * 7
+    assert len(calls) == 1
+
+    answers = {
+        response.text if is_stream else response.json()["response"]
+        for response in responses
+    }
+    assert len(answers) == 1
+    answer = answers.pop()
+    assert answer
+
+    for session_id in session_ids + ["late"]:
+        messages = routers.chat.sessions[session_id].messages
+        assert [message.type for message in messages] == ["human", "ai"]
+        assert messages[1].content == answer
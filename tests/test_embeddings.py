@@ -0,0 +1,53 @@
+import argparse
+import asyncio
+import pytest
+
+@pytest.fixture
+def embeddings_module(monkeypatch):
+    """services.embeddings wired to local fakes, restored afterwards."""
+    pytest.importorskip("langchain_core")
+    from loadtest.fakes import add_fake_arguments, install_fakes
+    import services.embeddings
+
+    parser = argparse.ArgumentParser()
+    add_fake_arguments(parser)
+    install_fakes(parser.parse_args(["--embed-ms", "0", "--upsert-ms", "0"]), patch=monkeypatch.setattr)
+
+    # Skip the real delete's two second wait for the index to go away
+    monkeypatch.setattr(
+        services.embeddings,
+        "delete_pinecone_index",
+        lambda: services.embeddings.pc.delete_index(services.embeddings.config.PINECONE_INDEX_NAME)
+    )
+    monkeypatch.setattr(services.embeddings, "get_token_counter", lambda: (lambda text: 1))
+    return services.embeddings
+
+class FailingEmbeddings:
+    def __init__(self, embeddings_module):
+        self.embeddings_module = embeddings_module
+        self.versions_seen = []
+
+    async def aembed_documents(self, texts):
+        self.versions_seen.append(self.embeddings_module.get_corpus_version())
+        raise ValueError("dimension mismatch")
+
+def test_store_embeddings_bumps_version_after_delete_and_failed_write(embeddings_module, monkeypatch):
+    failing = FailingEmbeddings(embeddings_module)
+    monkeypatch.setattr(embeddings_module, "get_embeddings_function", lambda **kwargs: failing)
+    before = embeddings_module.get_corpus_version()
+
+    result = asyncio.run(embeddings_module.store_embeddings(["chunk one", "chunk two"]))
+
+    assert result["status"] == "error"
+    # Already bumped by the delete, before any batch was written
+    assert failing.versions_seen and all(version > before for version in failing.versions_seen)
+    assert embeddings_module.get_corpus_version() > failing.versions_seen[-1]
+
+def test_store_embeddings_bumps_version_on_success(embeddings_module):
+    before = embeddings_module.get_corpus_version()
+
+    result = asyncio.run(embeddings_module.store_embeddings(["chunk one", "chunk two"]))
+
+    assert result["status"] == "success"
+    assert result["chunk_count"] == 2
+    assert embeddings_module.get_corpus_version() >= before + 2
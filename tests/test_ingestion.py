@@ -0,0 +1,198 @@
+import asyncio
+import time
+import services.ingestion
+from services.ingestion import IngestionWriter, batch_by_tokens, get_token_counter, is_retryable_error
+
+class FakeRateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        super().__init__("rate limited")
+        self.headers = {"retry-after": str(retry_after)}
+
+class FakeStatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+class FakeBackends:
+    """Embedding and vector store stand-ins with fixed latency"""
+
+    def __init__(self, embed_latency: float = 0.02, upsert_latency: float = 0.01):
+        self.embed_latency = embed_latency
+        self.upsert_latency = upsert_latency
+        self.embed_calls = 0
+        self.stored = {}
+
+    async def embed_documents(self, texts):
+        self.embed_calls += 1
+        await asyncio.sleep(self.embed_latency)
+        return [[float(len(text))] for text in texts]
+
+    async def upsert_vectors(self, vectors):
+        await asyncio.sleep(self.upsert_latency)
+        for record in vectors:
+            self.stored[record["id"]] = record
+
+def _writer(backends: FakeBackends, concurrency: int = 4, **kwargs) -> IngestionWriter:
+    return IngestionWriter(
+        embed_documents=backends.embed_documents,
+        upsert_vectors=backends.upsert_vectors,
+        batch_tokens=10,
+        embed_concurrency=concurrency,
+        upsert_concurrency=concurrency,
+        backoff_base=0.01,
+        count_tokens=lambda text: 1,
+        **kwargs
+    )
+
+def test_batch_by_tokens_respects_budget():
+    batches = batch_by_tokens(["a"] * 25, max_tokens=10, count_tokens=lambda text: 1)
+    assert batches == [(0, 10), (10, 20), (20, 25)]
+
+    # An oversized chunk still gets a batch of its own
+    assert batch_by_tokens(["big", "a"], max_tokens=2, count_tokens=len) == [(0, 1), (1, 2)]
+
+def test_throughput_scales_with_concurrency():
+    texts = [f"chunk {i}" for i in range(400)]
+    throughput = {}
+    for concurrency in (1, 8):
+        backends = FakeBackends()
+        stats = asyncio.run(_writer(backends, concurrency).write(texts))
+        assert stats["chunk_count"] == len(texts)
+        assert len(backends.stored) == len(texts)
+        throughput[concurrency] = stats["chunks_per_second"]
+
+    assert throughput[8] > 4 * throughput[1]
+
+def test_failing_batch_does_not_abort_document():
+    backends = FakeBackends()
+    embed = backends.embed_documents
+
+    async def embed_documents(texts):
+        if "poison" in texts:
+            raise ValueError("bad input")
+        return await embed(texts)
+
+    writer = _writer(backends, max_retries=2)
+    writer.embed_documents = embed_documents
+    texts = [f"chunk {i}" for i in range(30)]
+    texts[15] = "poison"
+
+    stats = asyncio.run(writer.write(texts))
+
+    assert stats["batch_count"] == 3
+    assert stats["failed_batch_count"] == 1
+    assert stats["chunk_count"] == 20
+    assert stats["failed_chunk_count"] == 10
+    assert len(backends.stored) == 20
+
+def test_rate_limited_batch_is_retried_after_hint():
+    backends = FakeBackends()
+    embed = backends.embed_documents
+    limited = []
+
+    async def embed_documents(texts):
+        if not limited:
+            limited.append(time.monotonic())
+            raise FakeRateLimitError(retry_after=0.2)
+        return await embed(texts)
+
+    writer = _writer(backends)
+    writer.embed_documents = embed_documents
+    started = time.monotonic()
+    stats = asyncio.run(writer.write([f"chunk {i}" for i in range(40)]))
+
+    assert stats["chunk_count"] == 40
+    assert stats["failed_batch_count"] == 0
+    assert time.monotonic() - started >= 0.2
+
+def test_failed_upsert_is_retried_without_reembedding():
+    backends = FakeBackends()
+    upsert = backends.upsert_vectors
+    failures = []
+
+    async def upsert_vectors(vectors):
+        if not failures:
+            failures.append(len(vectors))
+            raise ConnectionError("connection reset")
+        await upsert(vectors)
+
+    writer = _writer(backends)
+    writer.upsert_vectors = upsert_vectors
+    stats = asyncio.run(writer.write([f"chunk {i}" for i in range(30)]))
+
+    assert stats["chunk_count"] == 30
+    assert backends.embed_calls == 3
+    assert len(backends.stored) == 30
+
+def test_retryable_errors():
+    assert is_retryable_error(FakeRateLimitError(retry_after=1))
+    assert is_retryable_error(FakeStatusError(503))
+    assert is_retryable_error(ConnectionError("reset"))
+    assert is_retryable_error(asyncio.TimeoutError())
+    assert not is_retryable_error(FakeStatusError(400))
+    assert not is_retryable_error(FakeStatusError(401))
+    assert not is_retryable_error(ValueError("dimension mismatch"))
+
+def test_client_error_fails_after_single_call():
+    calls = []
+
+    async def embed_documents(texts):
+        calls.append(texts)
+        raise FakeStatusError(401)
+
+    writer = _writer(FakeBackends(), max_retries=5)
+    writer.backoff_base = 1.0
+    writer.embed_documents = embed_documents
+    started = time.monotonic()
+    stats = asyncio.run(writer.write([f"chunk {i}" for i in range(80)]))
+
+    assert stats["chunk_count"] == 0
+    assert stats["failed_batch_count"] == 8
+    assert len(calls) == 8
+    assert time.monotonic() - started < 0.5
+
+def test_backoff_does_not_hold_embed_slot():
+    backends = FakeBackends()
+    embed = backends.embed_documents
+    order = []
+
+    async def embed_documents(texts):
+        order.append(texts[0])
+        if order.count("chunk 0") == 1 and texts[0] == "chunk 0":
+            raise FakeStatusError(503)
+        return await embed(texts)
+
+    writer = _writer(backends, concurrency=1)
+    writer.backoff_base = 0.2
+    writer.embed_documents = embed_documents
+    stats = asyncio.run(writer.write([f"chunk {i}" for i in range(40)]))
+
+    assert stats["chunk_count"] == 40
+    # The other batches use the only slot while the first one backs off
+    assert order == ["chunk 0", "chunk 10", "chunk 20", "chunk 30", "chunk 0"]
+
+def test_token_counter_retries_after_failed_load(monkeypatch):
+    class FakeEncoding:
+        def encode(self, text, disallowed_special=()):
+            return text.split()
+
+    loads = []
+
+    def get_encoding(name):
+        loads.append(name)
+        if len(loads) == 1:
+            raise ConnectionError("offline")
+        return FakeEncoding()
+
+    monkeypatch.setattr(services.ingestion.tiktoken, "get_encoding", get_encoding)
+    services.ingestion._load_encoding.cache_clear()
+    try:
+        # The fallback estimates a quarter of the characters: 7 // 4 == 1
+        assert get_token_counter()("one two") == 1
+        assert get_token_counter()("one two") == 2
+        assert get_token_counter()("one two") == 2
+        assert len(loads) == 2
+    finally:
+        services.ingestion._load_encoding.cache_clear()